@@ -1,18 +1,26 @@
 from __future__ import annotations
 
+import asyncio
 import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 
+import aiofiles
+import faiss
+import numpy as np
 from fastapi import FastAPI, File, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
 
 from rag_agent import config
+from rag_agent.cache import SemanticCache
 from rag_agent.ingest import ingest_pdfs
-from rag_agent.retriever import Retriever
+from rag_agent.retriever import RetrievedChunk, Retriever
 from rag_agent.llm import generate_answer
+from rag_agent.models import warm_up_embedding_model
 
 
 app = FastAPI(title="RAG PDF QA Agent", version="1.0.0")
@@ -31,12 +39,73 @@ static_dir = Path(__file__).parent / "static"
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
 _retriever: Retriever | None = None
+_answer_cache = SemanticCache()
+# Ingestion loads, extends and saves the whole store, so concurrent runs would drop each other's chunks
+_ingest_lock = asyncio.Lock()
+
+
+def _embed_and_search(retriever: Retriever, questions: List[str]) -> Tuple[np.ndarray, List[List[RetrievedChunk]]]:
+	query_vecs = retriever.embed_queries(questions)
+	return query_vecs, retriever.search_vectors(query_vecs)
+
+
+class _QueryBatcher:
+	"""Coalesce concurrent /ask queries into one batched embed + search call."""
+
+	def __init__(self, max_batch: int, max_wait: float) -> None:
+		self.max_batch = max_batch
+		self.max_wait = max_wait
+		self._queue: asyncio.Queue[Tuple[str, asyncio.Future]] = asyncio.Queue()
+		self._task: asyncio.Task | None = None
+
+	def start(self) -> None:
+		self._task = asyncio.get_running_loop().create_task(self._run())
+
+	async def submit(self, question: str) -> Tuple[np.ndarray, List[RetrievedChunk]]:
+		"""Return (query vector, retrieved chunks) for the question."""
+		future = asyncio.get_running_loop().create_future()
+		await self._queue.put((question, future))
+		return await future
+
+	async def _run(self) -> None:
+		loop = asyncio.get_running_loop()
+		while True:
+			batch = [await self._queue.get()]
+			# Give concurrent requests a moment to join the batch
+			await asyncio.sleep(self.max_wait)
+			while len(batch) < self.max_batch and not self._queue.empty():
+				batch.append(self._queue.get_nowait())
+			retriever = _retriever
+			questions = [question for question, _ in batch]
+			try:
+				query_vecs, results = await loop.run_in_executor(None, _embed_and_search, retriever, questions)
+			except Exception as e:
+				for _, future in batch:
+					if not future.done():
+						future.set_exception(e)
+				continue
+			for (_, future), query_vec, chunks in zip(batch, query_vecs, results):
+				if not future.done():
+					future.set_result((query_vec, chunks))
+
+
+_query_batcher = _QueryBatcher(config.QUERY_BATCH_MAX_SIZE, config.QUERY_BATCH_MAX_WAIT)
+
+
+@app.on_event("startup")
+async def _configure_executor() -> None:
+	# Blocking ingest/ask work runs here so the event loop keeps serving other requests
+	asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=config.EXECUTOR_WORKERS))
+	faiss.omp_set_num_threads(config.FAISS_OMP_THREADS)
+	_query_batcher.start()
 
 
 @app.on_event("startup")
 def _load_retriever_on_startup() -> None:
 	global _retriever
 	try:
+		# Inside the try, so an unavailable model (e.g. offline host) doesn't stop the server from starting
+		warm_up_embedding_model()
 		_retriever = Retriever()
 	except Exception:
 		_retriever = None
@@ -52,41 +121,78 @@ def index() -> HTMLResponse:
 async def ingest(files: List[UploadFile] = File(...)):
 	if not files:
 		raise HTTPException(status_code=400, detail="No files uploaded")
-	paths: List[Path] = []
-	for f in files:
-		if not f.filename.lower().endswith(".pdf"):
-			raise HTTPException(status_code=400, detail=f"Unsupported file type: {f.filename}")
-		dst = config.UPLOADS_DIR / f.filename
-		with open(dst, "wb") as out:
-			out.write(await f.read())
-		paths.append(dst)
-
-	stats = ingest_pdfs(paths)
-	# Reload retriever after ingestion
-	global _retriever
+	# Uploads are streamed to unique temp files and only moved onto their final names under
+	# the ingest lock, so they never overwrite a PDF another ingestion is still reading
+	uploads: List[Tuple[Path, Path]] = []  # (temp path, final path)
 	try:
-		_retriever = Retriever()
-	except Exception as e:
-		raise HTTPException(status_code=500, detail=f"Failed to initialize retriever: {e}")
+		for f in files:
+			if not f.filename.lower().endswith(".pdf"):
+				raise HTTPException(status_code=400, detail=f"Unsupported file type: {f.filename}")
+			tmp = config.UPLOADS_DIR / f".{uuid.uuid4().hex}.part"
+			uploads.append((tmp, config.UPLOADS_DIR / f.filename))
+			# Stream to disk in fixed-size chunks instead of buffering the whole upload in memory
+			written = 0
+			async with aiofiles.open(tmp, "wb") as out:
+				while chunk := await f.read(config.UPLOAD_CHUNK_SIZE):
+					written += len(chunk)
+					if written > config.MAX_UPLOAD_BYTES:
+						break
+					await out.write(chunk)
+			if written > config.MAX_UPLOAD_BYTES:
+				raise HTTPException(status_code=413, detail=f"File too large: {f.filename}")
+
+		loop = asyncio.get_running_loop()
+		global _retriever
+		async with _ingest_lock:
+			# Same final name as a previous upload, so re-ingestion replaces its chunks
+			for tmp, dst in uploads:
+				os.replace(tmp, dst)
+			paths = [dst for _, dst in uploads]
+			stats, updated_index, updated_metadata = await loop.run_in_executor(None, ingest_pdfs, paths)
+			if _retriever is not None:
+				# Hot-swap the in-memory index instead of rebuilding the retriever from disk
+				await loop.run_in_executor(None, _retriever.swap_index, updated_index, updated_metadata)
+			else:
+				try:
+					_retriever = await loop.run_in_executor(None, Retriever)
+				except Exception as e:
+					raise HTTPException(status_code=500, detail=f"Failed to initialize retriever: {e}")
+			_answer_cache.clear()
+	finally:
+		for tmp, _ in uploads:
+			tmp.unlink(missing_ok=True)
 	return {"message": "Ingestion complete", **stats}
 
 
+def _answer_from_results(question: str, query_vec: np.ndarray, results: List[RetrievedChunk], cache_generation: int) -> dict:
+	"""Generate an answer from retrieved chunks and cache it. Blocking."""
+	contexts = [
+		{"text": r.text, "score": r.score, "source_path": r.source_path, "source_name": r.source_name, "page_number": r.page_number, "chunk_index": r.chunk_index}
+		for r in results
+	]
+	answer = generate_answer(question, contexts)
+	if not answer["used_model"].startswith("fallback-due-to-error"):
+		_answer_cache.put(question, query_vec, answer, cache_generation)
+	return answer
+
+
 @app.post("/ask")
 async def ask(payload: dict):
 	global _retriever
+	loop = asyncio.get_running_loop()
 	if _retriever is None:
 		try:
-			_retriever = Retriever()
+			_retriever = await loop.run_in_executor(None, Retriever)
 		except Exception:
 			raise HTTPException(status_code=400, detail="No knowledge base found. Ingest PDFs first.")
 	question = payload.get("question", "").strip()
 	if not question:
 		raise HTTPException(status_code=400, detail="Question is required")
-	results = _retriever.search(question)
-	contexts = [
-		{"text": r.text, "score": r.score, "source_path": r.source_path, "page_number": r.page_number, "chunk_index": r.chunk_index}
-		for r in results
-	]
-	answer = generate_answer(question, contexts)
+	answer = _answer_cache.get(question)
+	if answer is None:
+		cache_generation = _answer_cache.generation
+		query_vec, results = await _query_batcher.submit(question)
+		answer = _answer_cache.get_similar(query_vec)
+		if answer is None:
+			answer = await loop.run_in_executor(None, _answer_from_results, question, query_vec, results, cache_generation)
 	return {"question": question, **answer}
-
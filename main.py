@@ -16,7 +16,7 @@ def cmd_ingest(paths: list[str]) -> None:
 	if not paths:
 		print("Provide at least one PDF path.")
 		sys.exit(1)
-	stats = ingest_pdfs([Path(p) for p in paths])
+	stats, _, _ = ingest_pdfs([Path(p) for p in paths], show_progress=True)
 	print(f"Ingestion complete: {stats}")
 
 
@@ -28,7 +28,7 @@ def cmd_ask(question: str) -> None:
 		sys.exit(1)
 	results = retriever.search(question)
 	contexts = [
-		{"text": r.text, "score": r.score, "source_path": r.source_path, "page_number": r.page_number, "chunk_index": r.chunk_index}
+		{"text": r.text, "score": r.score, "source_path": r.source_path, "source_name": r.source_name, "page_number": r.page_number, "chunk_index": r.chunk_index}
 		for r in results
 	]
 	answer = generate_answer(question, contexts)
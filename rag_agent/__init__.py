@@ -1,9 +1,18 @@
 """RAG Agent package: ingestion, retrieval and answering for PDF QA."""
 
+import os
+
+# Let the Rust tokenizer use its thread pool; must be set before tokenizers is first used
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+
 __all__ = [
 	"config",
+	"models",
 	"ingest",
+	"pdf",
 	"retriever",
+	"store",
 	"llm",
+	"cache",
 ]
 
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from . import config
+
+
+class SemanticCache:
+	"""LRU cache of /ask responses, matched exactly by question or fuzzily by query embedding."""
+
+	def __init__(self, max_size: int = config.SEMANTIC_CACHE_SIZE, threshold: float = config.SEMANTIC_CACHE_THRESHOLD) -> None:
+		self.max_size = max_size
+		self.threshold = threshold
+		self._lock = threading.Lock()
+		self._slots: OrderedDict[str, int] = OrderedDict()  # question key -> row, in LRU order
+		self._vectors: np.ndarray | None = None  # (max_size, dim) query embeddings, one row per slot
+		self._keys: list[str] = []  # slot -> question key
+		self._responses: list[dict] = []
+		self._generation = 0  # bumped by clear(), so answers computed before it are not cached
+
+	@staticmethod
+	def _key(question: str) -> str:
+		return " ".join(question.lower().split())
+
+	@property
+	def generation(self) -> int:
+		"""Current cache generation; read it before retrieval and pass it to put()."""
+		return self._generation
+
+	def get(self, question: str) -> dict | None:
+		"""Return the cached response for the same question, ignoring case and whitespace."""
+		key = self._key(question)
+		with self._lock:
+			slot = self._slots.get(key)
+			if slot is None:
+				return None
+			self._slots.move_to_end(key)
+			return self._responses[slot]
+
+	def get_similar(self, query_vec: np.ndarray) -> dict | None:
+		"""Return the response of the most similar cached query, if its cosine similarity clears the threshold."""
+		with self._lock:
+			if not self._slots:
+				return None
+			scores = self._vectors[: len(self._responses)] @ query_vec
+			slot = int(np.argmax(scores))
+			if scores[slot] < self.threshold:
+				return None
+			self._slots.move_to_end(self._keys[slot])
+			return self._responses[slot]
+
+	def put(self, question: str, query_vec: np.ndarray, response: dict, generation: int) -> None:
+		"""Cache a response, unless the cache was cleared since its retrieval started at generation."""
+		key = self._key(question)
+		with self._lock:
+			if generation != self._generation:
+				return
+			if self._vectors is None:
+				self._vectors = np.zeros((self.max_size, query_vec.shape[0]), dtype=np.float32)
+			if key in self._slots:
+				slot = self._slots[key]
+				self._slots.move_to_end(key)
+				self._responses[slot] = response
+			elif len(self._responses) < self.max_size:
+				slot = len(self._responses)
+				self._slots[key] = slot
+				self._keys.append(key)
+				self._responses.append(response)
+			else:
+				_, slot = self._slots.popitem(last=False)  # evict least recently used
+				self._slots[key] = slot
+				self._keys[slot] = key
+				self._responses[slot] = response
+			self._vectors[slot] = query_vec
+
+	def clear(self) -> None:
+		with self._lock:
+			self._generation += 1
+			self._slots.clear()
+			self._keys.clear()
+			self._responses.clear()
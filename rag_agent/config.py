@@ -9,17 +9,62 @@ BASE_DIR: Path = Path(__file__).resolve().parent.parent
 DATA_DIR: Path = BASE_DIR / "data"
 UPLOADS_DIR: Path = DATA_DIR / "uploads"
 INDEX_PATH: Path = DATA_DIR / "index.faiss"
-METADATA_PATH: Path = DATA_DIR / "metadata.jsonl"
+METADATA_PATH: Path = DATA_DIR / "metadata.npz"
+LEGACY_METADATA_PATH: Path = DATA_DIR / "metadata.jsonl"  # written by older versions; migrated on first load
+TEXTS_PATH: Path = DATA_DIR / "texts.bin"
+BINARY_INDEX_PATH: Path = DATA_DIR / "binary.faiss"
+VECTORS_PATH: Path = DATA_DIR / "vectors.f32"
+EMBEDDING_CACHE_PATH: Path = DATA_DIR / "emb_cache.sqlite"
 
 
 # Embeddings
 EMBEDDING_MODEL_NAME: str = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_BATCH_SIZE: int = 256
+# Encoder input is capped at the model's max_seq_length times this. English averages about
+# 4 characters per token; the margin keeps the cut past the token limit for dense text too.
+CHARS_PER_TOKEN: int = 8
 
 
 # Retrieval
 TOP_K: int = 5
 
 
+# Vector index: "flat" (exact), "sq8" (int8 scalar quantized, 4x smaller than flat),
+# "hnsw" (graph, up to ~1M chunks) or "ivfpq" (compressed, larger corpora)
+FAISS_INDEX_TYPE: str = "sq8"
+SQ8_MIN_TRAINING_SIZE: int = 1000  # below this many chunks, use a flat index until the corpus grows
+HNSW_M: int = 32
+HNSW_EF_CONSTRUCTION: int = 200
+HNSW_EF_SEARCH: int = 64
+IVF_NLIST: int = 256
+IVF_NPROBE: int = 16
+IVFPQ_M: int = 16  # sub-quantizers; must divide the embedding dimension
+IVFPQ_NBITS: int = 8
+IVF_MIN_TRAINING_SIZE: int = IVF_NLIST * 39  # below this many chunks, use a flat index until the corpus grows
+FAISS_OMP_THREADS: int = min(8, os.cpu_count() or 1)
+# Re-ingested documents leave tombstone rows behind; rebuild the store once they make up this share
+COMPACT_DELETED_FRACTION: float = 0.25
+
+
+# Binary first-stage search: Hamming search over sign bits, then exact rerank of the
+# candidates with the raw float32 vectors. Enable before the first ingestion.
+USE_BINARY_INDEX: bool = False
+BINARY_RERANK_CANDIDATES: int = 50
+
+
+# /ask response cache: exact question match, or cosine similarity of query embeddings above threshold
+SEMANTIC_CACHE_SIZE: int = 512
+SEMANTIC_CACHE_THRESHOLD: float = 0.97
+
+
+# Server
+EXECUTOR_WORKERS: int = 4  # worker threads for blocking ingest/ask work
+UPLOAD_CHUNK_SIZE: int = 1 << 20  # bytes read per step when streaming uploads to disk
+MAX_UPLOAD_BYTES: int = 200 << 20  # per file
+QUERY_BATCH_MAX_SIZE: int = 16  # concurrent /ask queries embedded and searched together
+QUERY_BATCH_MAX_WAIT: float = 0.005  # seconds to wait for more queries to join a batch
+
+
 # Chunking
 CHUNK_SIZE: int = 750  # characters
 CHUNK_OVERLAP: int = 150  # characters
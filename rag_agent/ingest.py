@@ -1,17 +1,33 @@
 from __future__ import annotations
 
-import json
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import Dict, Iterable, List, Set, Tuple
 
 import faiss
 import numpy as np
-from pypdf import PdfReader
+import torch
 from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 
 from . import config
+from .models import get_embedding_model
+from .pdf import read_pdf_text
+from .store import ChunkColumns, append_chunks, compact_columns, legacy_metadata_exists, load_columns, mark_deleted, metadata_exists, read_legacy_metadata, save_columns
+
+
+logger = logging.getLogger(__name__)
+_migration_lock = threading.Lock()
 
 
 @dataclass
@@ -23,130 +39,403 @@ class ChunkMetadata:
 	chunk_index: int
 
 
-def _read_pdf_text(pdf_path: Path) -> List[str]:
-	"""Extract text per page from a PDF file."""
-	reader = PdfReader(str(pdf_path))
-	pages: List[str] = []
-	for page in reader.pages:
-		pages.append(page.extract_text() or "")
-	return pages
+def _extraction_context() -> multiprocessing.context.BaseContext:
+	"""Start method for PDF extraction worker processes.
+
+	Forking this process is unsafe once torch, tokenizer or OpenMP threads are running, so
+	workers come from a forkserver that preloads only the pdf module (spawn where unavailable).
+	"""
+	if "forkserver" not in multiprocessing.get_all_start_methods():
+		return multiprocessing.get_context("spawn")
+	context = multiprocessing.get_context("forkserver")
+	context.set_forkserver_preload([read_pdf_text.__module__])
+	return context
+
 
+_PARAGRAPH_BREAK = re.compile(r"\n\n")
 
-def _split_into_paragraphs(text: str) -> List[str]:
-	paragraphs = [p.strip() for p in text.split("\n\n")]
-	return [p for p in paragraphs if p]
 
+def _sliding_window(text: str, chunk_size: int, overlap: int) -> List[str]:
+	"""Create chunks using a sliding window over the page text.
 
-def _sliding_window(paragraphs: List[str], chunk_size: int, overlap: int) -> List[str]:
-	"""Create chunks using a sliding window over concatenated paragraphs."""
-	joined = "\n\n".join(paragraphs)
+	Windows end at the last paragraph break they contain (falling back to a hard cut),
+	and chunks are sliced straight from the page text.
+	"""
+	breaks = [m.start() for m in _PARAGRAPH_BREAK.finditer(text)]
 	chunks: List[str] = []
 	start = 0
-	length = len(joined)
+	length = len(text)
 	while start < length and len(chunks) < config.MAX_CHUNKS_PER_PAGE:
 		end = min(start + chunk_size, length)
-		chunk = joined[start:end]
-		chunks.append(chunk)
+		if end < length:
+			i = bisect_right(breaks, end) - 1
+			# Only take the break if the next window still moves forward past the overlap
+			if i >= 0 and breaks[i] > start + overlap:
+				end = breaks[i]
+		chunk = text[start:end].strip()
+		if chunk:
+			chunks.append(chunk)
 		if end == length:
 			break
-		start = max(0, end - overlap)
+		start = end - overlap
 	return chunks
 
 
-def _normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
-	"""L2-normalize for cosine similarity with FAISS inner product index."""
-	norms = np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-10
-	return embeddings / norms
+def _encode(model: SentenceTransformer, texts: List[str], show_progress: bool) -> np.ndarray:
+	"""Embed texts as L2-normalized vectors for cosine similarity with the inner product index."""
+	# No need to pre-sort by length: encode() already batches texts in length order
+	# (to minimize padding) and restores the input order before returning.
+	with torch.inference_mode():
+		return model.encode(
+			texts,
+			show_progress_bar=show_progress,
+			convert_to_numpy=True,
+			convert_to_tensor=False,
+			batch_size=config.EMBEDDING_BATCH_SIZE,
+			normalize_embeddings=True,
+		)
 
 
-def _load_embedding_model() -> SentenceTransformer:
-	return SentenceTransformer(config.EMBEDDING_MODEL_NAME)
+def _embedding_cache_key(text: str) -> bytes:
+	# Include the model name so switching models never serves stale vectors
+	return hashlib.sha256(f"{config.EMBEDDING_MODEL_NAME}\0{text}".encode("utf-8")).digest()
 
 
-def _embed_texts(model: SentenceTransformer, texts: List[str]) -> np.ndarray:
-	emb = model.encode(texts, show_progress_bar=True, convert_to_numpy=True, batch_size=64, normalize_embeddings=False)
-	return _normalize_embeddings(emb)
+def _truncate_for_embedding(model: SentenceTransformer, texts: List[str]) -> List[str]:
+	"""Cut texts well past the model's max sequence length, so the tokenizer doesn't process a tail it would drop.
 
-
-def _load_index_and_metadata() -> Tuple[faiss.Index, List[Dict]]:
+	Only chunks much longer than the model's limit are affected, i.e. when CHUNK_SIZE is raised.
+	"""
+	if not model.max_seq_length:
+		return texts
+	max_chars = model.max_seq_length * config.CHARS_PER_TOKEN
+	truncated = sum(len(t) > max_chars for t in texts)
+	if truncated:
+		logger.info("Truncated %d of %d chunks to %d characters for embedding", truncated, len(texts), max_chars)
+	return [t[:max_chars] for t in texts]
+
+
+def _embed_texts(model: SentenceTransformer, texts: List[str], show_progress: bool = False) -> np.ndarray:
+	"""Embed texts, reusing cached vectors for chunks whose text was embedded before."""
+	keys = [_embedding_cache_key(t) for t in texts]
+	emb = np.empty((len(texts), model.get_sentence_embedding_dimension()), dtype=np.float32)
+	with closing(sqlite3.connect(config.EMBEDDING_CACHE_PATH)) as conn, conn:
+		conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash BLOB PRIMARY KEY, vec BLOB NOT NULL)")
+		cached: Dict[bytes, bytes] = {}
+		unique_keys = list(set(keys))
+		for start in range(0, len(unique_keys), 500):  # stay under SQLite's bound-parameter limit
+			batch = unique_keys[start:start + 500]
+			placeholders = ",".join("?" * len(batch))
+			cached.update(conn.execute(f"SELECT hash, vec FROM embeddings WHERE hash IN ({placeholders})", batch))
+
+		missing: Dict[bytes, int] = {}
+		for i, key in enumerate(keys):
+			if key in cached:
+				emb[i] = np.frombuffer(cached[key], dtype=np.float32)
+			else:
+				missing.setdefault(key, i)
+		if missing:
+			first_rows = list(missing.values())
+			emb[first_rows] = _encode(model, [texts[i] for i in first_rows], show_progress)  # casts to float32 in place
+			for i, key in enumerate(keys):
+				if key in missing and missing[key] != i:
+					emb[i] = emb[missing[key]]
+			conn.executemany(
+				"INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)",
+				[(key, emb[i].tobytes()) for key, i in missing.items()],
+			)
+	# FAISS consumes float32 C-contiguous arrays without copying
+	return np.ascontiguousarray(emb, dtype=np.float32)
+
+
+def _load_index_and_metadata() -> Tuple[faiss.Index, ChunkColumns]:
 	"""Load existing FAISS index and metadata if available, otherwise create new."""
-	if config.INDEX_PATH.exists() and config.METADATA_PATH.exists():
+	if config.INDEX_PATH.exists() and legacy_metadata_exists():
+		return migrate_legacy_store()
+	if config.INDEX_PATH.exists() and metadata_exists():
 		index = faiss.read_index(str(config.INDEX_PATH))
-		metadata: List[Dict] = []
-		with open(config.METADATA_PATH, "r", encoding="utf-8") as f:
-			for line in f:
-				metadata.append(json.loads(line))
-		return index, metadata
+		return index, load_columns()
 	# Create empty index; infer dimension from model
-	model = _load_embedding_model()
+	model = get_embedding_model()
 	dim = model.get_sentence_embedding_dimension()
-	index = faiss.IndexFlatIP(dim)
-	return index, []
+	return _create_index(dim), ChunkColumns.empty()
 
 
-def _append_to_store(index: faiss.Index, metadata_store: List[Dict], embeddings: np.ndarray, chunk_metas: List[ChunkMetadata]) -> Tuple[faiss.Index, List[Dict]]:
-	"""Append new embeddings and metadata to the existing index and store."""
-	start_id = len(metadata_store)
-	index.add(embeddings.astype(np.float32))
-	for i, meta in enumerate(chunk_metas):
-		record = {
-			"chunk_id": start_id + i,
-			"text": meta.text,
-			"source_path": meta.source_path,
-			"page_number": meta.page_number,
-			"chunk_index": meta.chunk_index,
-		}
-		metadata_store.append(record)
+def _create_index(dim: int) -> faiss.Index:
+	"""Create an empty index with explicit chunk ids, so chunks can later be removed by id."""
+	return faiss.IndexIDMap2(_create_base_index(dim))
+
+
+def _create_base_index(dim: int) -> faiss.Index:
+	"""Create an empty inner product index of the type selected in config."""
+	index_type = config.FAISS_INDEX_TYPE
+	if index_type == "flat":
+		return faiss.IndexFlatIP(dim)
+	if index_type == "sq8":
+		return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+	if index_type == "hnsw":
+		index = faiss.IndexHNSWFlat(dim, config.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+		index.hnsw.efConstruction = config.HNSW_EF_CONSTRUCTION
+		return index
+	if index_type == "ivfpq":
+		quantizer = faiss.IndexFlatIP(dim)
+		return faiss.IndexIVFPQ(quantizer, dim, config.IVF_NLIST, config.IVFPQ_M, config.IVFPQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+	raise ValueError(f"Unknown FAISS_INDEX_TYPE: {index_type}")
+
+
+def _min_training_size() -> int:
+	"""Smallest corpus worth training the configured quantized index on."""
+	if config.FAISS_INDEX_TYPE == "hnsw":
+		return 0  # needs no training
+	if config.FAISS_INDEX_TYPE == "sq8":
+		return config.SQ8_MIN_TRAINING_SIZE
+	return config.IVF_MIN_TRAINING_SIZE
+
+
+def _base_index(index: faiss.Index) -> faiss.Index:
+	"""Return the index wrapped by the id map, downcast to its concrete type."""
+	base = faiss.downcast_index(index)
+	if isinstance(base, faiss.IndexIDMap):
+		base = faiss.downcast_index(base.index)
+	return base
+
+
+def _add_to_index(index: faiss.Index, embeddings: np.ndarray, start_id: int) -> faiss.Index:
+	"""Add embeddings under consecutive ids, training the configured index type once there is enough data.
+
+	Until the corpus reaches the training size, vectors go into a flat index; once it does,
+	that index is rebuilt into the configured type, keeping the existing chunk ids.
+	"""
+	new_ids = np.arange(start_id, start_id + len(embeddings), dtype=np.int64)
+	is_fallback = config.FAISS_INDEX_TYPE != "flat" and isinstance(_base_index(index), faiss.IndexFlat)
+	if index.is_trained and not is_fallback:
+		index.add_with_ids(embeddings, new_ids)
+		return index
+	if is_fallback and index.ntotal:
+		existing = _base_index(index).reconstruct_n(0, index.ntotal)
+		existing_ids = faiss.vector_to_array(faiss.downcast_index(index).id_map)
+	else:
+		existing = np.empty((0, index.d), dtype=np.float32)
+		existing_ids = np.empty(0, dtype=np.int64)
+	if index.ntotal + len(embeddings) < _min_training_size():
+		if not is_fallback:
+			index = faiss.IndexIDMap2(faiss.IndexFlatIP(index.d))
+		index.add_with_ids(embeddings, new_ids)
+		return index
+	index = _create_index(index.d)
+	index.train(np.concatenate([existing, embeddings]))
+	if len(existing):
+		index.add_with_ids(existing, existing_ids)
+	index.add_with_ids(embeddings, new_ids)
+	return index
+
+
+def _append_to_store(index: faiss.Index, metadata_store: ChunkColumns, embeddings: np.ndarray, chunk_metas: List[ChunkMetadata]) -> Tuple[faiss.Index, ChunkColumns]:
+	"""Append new embeddings and metadata to the existing index and store.
+
+	Chunk texts are appended to the on-disk text blob right away; the index and the
+	remaining columns are written by _save_index_and_metadata.
+	"""
+	assert embeddings.dtype == np.float32 and embeddings.flags["C_CONTIGUOUS"]
+	# Chunk ids are row numbers in the metadata store, which only ever grows
+	index = _add_to_index(index, embeddings, start_id=len(metadata_store))
+	metadata_store = append_chunks(
+		metadata_store,
+		texts=[meta.text for meta in chunk_metas],
+		source_paths=[meta.source_path for meta in chunk_metas],
+		page_numbers=[meta.page_number for meta in chunk_metas],
+		chunk_indices=[meta.chunk_index for meta in chunk_metas],
+	)
 	return index, metadata_store
 
 
-def _save_index_and_metadata(index: faiss.Index, metadata_store: List[Dict]) -> None:
-	faiss.write_index(index, str(config.INDEX_PATH))
-	with open(config.METADATA_PATH, "w", encoding="utf-8") as f:
-		for rec in metadata_store:
-			f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+def _remove_stale_chunks(index: faiss.Index, metadata_store: ChunkColumns, source_paths: Set[str]) -> np.ndarray:
+	"""Remove the indexed chunks of documents that are being re-ingested and return their ids.
+
+	The caller marks their metadata rows deleted; they stay behind as tombstones until the
+	next compaction, so chunk ids keep matching rows.
+	"""
+	stale_sources = [i for i, path in enumerate(metadata_store.source_table) if path in source_paths]
+	stale_rows = np.isin(metadata_store.source_ids, stale_sources) & ~metadata_store.deleted
+	stale_ids = np.flatnonzero(stale_rows).astype(np.int64)
+	if not len(stale_ids):
+		return stale_ids
+	try:
+		index.remove_ids(stale_ids)
+	except RuntimeError:
+		# HNSW can't remove vectors; the retriever skips deleted rows instead
+		logger.info("Index type does not support removal; previous chunks of re-ingested documents are filtered at search time.")
+	return stale_ids
+
+
+def _needs_compaction(metadata_store: ChunkColumns) -> bool:
+	return len(metadata_store) > 0 and np.mean(metadata_store.deleted) > config.COMPACT_DELETED_FRACTION
+
+
+def _tmp_path(path: Path) -> Path:
+	"""Sibling path to write a replacement for path to, keeping its suffix (np.savez needs .npz)."""
+	return path.with_name(f"{path.stem}.tmp{path.suffix}")
+
+
+def _compact_store(model: SentenceTransformer, metadata_store: ChunkColumns, show_progress: bool = False) -> Tuple[faiss.Index, ChunkColumns, np.ndarray]:
+	"""Rebuild the index and store without deleted rows, renumbering chunk ids to 0..n-1.
+
+	Live chunks are re-embedded, which mostly hits the embedding cache; their embeddings are
+	returned for the binary sidecar. The compacted texts go to a temporary file, which
+	_save_index_and_metadata moves into place together with the index and columns.
+	"""
+	live_texts = [metadata_store.text(i) for i in np.flatnonzero(~metadata_store.deleted)]
+	embeddings = _embed_texts(model, _truncate_for_embedding(model, live_texts), show_progress)
+	index = _add_to_index(_create_index(embeddings.shape[1]), embeddings, start_id=0)
+	metadata_store = compact_columns(metadata_store, _tmp_path(config.TEXTS_PATH))
+	return index, metadata_store, embeddings
+
+
+def _update_binary_sidecar(embeddings: np.ndarray, start_id: int, stale_ids: np.ndarray) -> None:
+	"""Mirror index updates into the sign-binarized codes and raw float32 vectors used for binary search.
+
+	Skipped when the sidecar doesn't cover the existing store (e.g. enabled after earlier ingestions).
+	"""
+	dim = embeddings.shape[1]
+	if config.BINARY_INDEX_PATH.exists():
+		binary_index = faiss.read_index_binary(str(config.BINARY_INDEX_PATH))
+		stored_rows = config.VECTORS_PATH.stat().st_size // (4 * dim) if config.VECTORS_PATH.exists() else -1
+	else:
+		binary_index = faiss.IndexBinaryIDMap2(faiss.IndexBinaryFlat(dim))
+		stored_rows = 0
+	if stored_rows != start_id:
+		return
+	if len(stale_ids):
+		binary_index.remove_ids(stale_ids)
+	binary_index.add_with_ids(np.packbits(embeddings > 0, axis=1), np.arange(start_id, start_id + len(embeddings), dtype=np.int64))
+	with open(config.VECTORS_PATH, "ab" if start_id else "wb") as f:
+		embeddings.tofile(f)
+	faiss.write_index_binary(binary_index, str(config.BINARY_INDEX_PATH))
+
+
+def _write_binary_sidecar(embeddings: np.ndarray) -> None:
+	"""Replace the sidecar with one holding exactly these embeddings, under ids 0..n-1.
+
+	Both files are swapped in with os.replace, since a retriever may still be mapping the old vectors.
+	"""
+	binary_index = faiss.IndexBinaryIDMap2(faiss.IndexBinaryFlat(embeddings.shape[1]))
+	binary_index.add_with_ids(np.packbits(embeddings > 0, axis=1), np.arange(len(embeddings), dtype=np.int64))
+	embeddings.tofile(_tmp_path(config.VECTORS_PATH))
+	faiss.write_index_binary(binary_index, str(_tmp_path(config.BINARY_INDEX_PATH)))
+	os.replace(_tmp_path(config.VECTORS_PATH), config.VECTORS_PATH)
+	os.replace(_tmp_path(config.BINARY_INDEX_PATH), config.BINARY_INDEX_PATH)
+
 
+def migrate_legacy_store() -> Tuple[faiss.Index, ChunkColumns]:
+	"""Convert a store written by older versions (plain flat index + metadata.jsonl) to the current format.
+
+	Vectors are copied out of the old index, so nothing is re-embedded; metadata.jsonl is left in place.
+	"""
+	with _migration_lock:
+		if not legacy_metadata_exists():
+			# Migrated by a concurrent caller
+			return faiss.read_index(str(config.INDEX_PATH)), load_columns()
+		legacy_index = faiss.read_index(str(config.INDEX_PATH))
+		records = read_legacy_metadata()
+		if legacy_index.ntotal != len(records):
+			raise RuntimeError(
+				f"Cannot migrate {config.LEGACY_METADATA_PATH}: it has {len(records)} records but the index has "
+				f"{legacy_index.ntotal} vectors. Delete {config.DATA_DIR} and re-ingest your PDFs."
+			)
+		vectors = np.ascontiguousarray(legacy_index.reconstruct_n(0, legacy_index.ntotal), dtype=np.float32).reshape(-1, legacy_index.d)
+		index = _add_to_index(_create_index(legacy_index.d), vectors, start_id=0)
+		metadata_store = append_chunks(
+			ChunkColumns.empty(),
+			texts=[rec["text"] for rec in records],
+			source_paths=[rec["source_path"] for rec in records],
+			page_numbers=[rec["page_number"] for rec in records],
+			chunk_indices=[rec["chunk_index"] for rec in records],
+		)
+		_save_index_and_metadata(index, metadata_store)
+		if config.USE_BINARY_INDEX:
+			_write_binary_sidecar(vectors)
+		logger.info("Migrated %d chunks from %s to the columnar store", len(records), config.LEGACY_METADATA_PATH)
+		return index, metadata_store
+
+
+def _save_index_and_metadata(index: faiss.Index, metadata_store: ChunkColumns, compacted: bool = False) -> None:
+	"""Write the index and metadata columns.
+
+	A compaction renumbers the texts, columns and index alike, so all three are written to
+	temporary files first and only then moved into place.
+	"""
+	if not compacted:
+		faiss.write_index(index, str(config.INDEX_PATH))
+		save_columns(metadata_store)
+		return
+	faiss.write_index(index, str(_tmp_path(config.INDEX_PATH)))
+	save_columns(metadata_store, _tmp_path(config.METADATA_PATH))
+	for path in (config.TEXTS_PATH, config.METADATA_PATH, config.INDEX_PATH):
+		os.replace(_tmp_path(path), path)
 
-def ingest_pdfs(pdf_paths: Iterable[Path]) -> Dict[str, int]:
+
+def ingest_pdfs(pdf_paths: Iterable[Path], show_progress: bool = False) -> Tuple[Dict[str, int], faiss.Index, ChunkColumns]:
 	"""Ingest PDF files, updating the FAISS index and metadata store.
 
-	Returns statistics about the ingestion process.
+	Set show_progress for interactive (CLI) use to display an embedding progress bar.
+	Returns statistics about the ingestion process and the updated in-memory index and metadata.
 	"""
 	config.ensure_directories()
 	index, metadata_store = _load_index_and_metadata()
-	model = _load_embedding_model()
+	model = get_embedding_model()
 
 	all_new_chunks: List[str] = []
 	all_new_metas: List[ChunkMetadata] = []
 
-	for path in pdf_paths:
-		path = Path(path)
-		if not path.exists() or path.suffix.lower() != ".pdf":
-			continue
-		pages = _read_pdf_text(path)
+	valid_paths: List[Path] = []
+	for path in dict.fromkeys(Path(p).resolve() for p in pdf_paths):
+		if path.exists() and path.suffix.lower() == ".pdf":
+			valid_paths.append(path)
+
+	# Text extraction is CPU-bound and independent per file, so fan out across processes
+	if len(valid_paths) > 1:
+		with ProcessPoolExecutor(max_workers=min(len(valid_paths), os.cpu_count() or 1), mp_context=_extraction_context()) as ex:
+			all_pages = list(ex.map(read_pdf_text, valid_paths))
+	else:
+		all_pages = [read_pdf_text(path) for path in valid_paths]
+
+	for path, pages in zip(valid_paths, all_pages):
 		for page_num, text in enumerate(pages, start=1):
-			paragraphs = _split_into_paragraphs(text)
-			if not paragraphs:
-				continue
-			chunks = _sliding_window(paragraphs, chunk_size=config.CHUNK_SIZE, overlap=config.CHUNK_OVERLAP)
+			chunks = _sliding_window(text, chunk_size=config.CHUNK_SIZE, overlap=config.CHUNK_OVERLAP)
 			for chunk_idx, chunk in enumerate(chunks):
 				all_new_chunks.append(chunk)
 				all_new_metas.append(
 					ChunkMetadata(
 						chunk_id=-1,
 						text=chunk,
-						source_path=str(path.resolve()),
+						source_path=str(path),
 						page_number=page_num,
 						chunk_index=chunk_idx,
 					)
 				)
 
-	if not all_new_chunks:
-		return {"added_chunks": 0, "total_chunks": len(metadata_store)}
+	# Re-ingesting a document replaces its previous chunks
+	stale_ids = _remove_stale_chunks(index, metadata_store, {str(path) for path in valid_paths})
+	if not all_new_chunks and not len(stale_ids):
+		return {"added_chunks": 0, "total_chunks": metadata_store.num_live}, index, metadata_store
+	metadata_store = mark_deleted(metadata_store, stale_ids)
 
-	embeddings = _embed_texts(model, all_new_chunks)
+	# Stored chunk text stays complete; only the encoder input is capped
+	embeddings = _embed_texts(model, _truncate_for_embedding(model, all_new_chunks), show_progress)
+	start_id = len(metadata_store)
 	index, metadata_store = _append_to_store(index, metadata_store, embeddings, all_new_metas)
-	_save_index_and_metadata(index, metadata_store)
-
-	return {"added_chunks": len(all_new_chunks), "total_chunks": len(metadata_store)}
+	# Drop tombstones once they take up a large share of the store. Done last, so nothing
+	# on disk is renumbered until the compacted files are saved together.
+	compacted = _needs_compaction(metadata_store)
+	if compacted:
+		index, metadata_store, live_embeddings = _compact_store(model, metadata_store, show_progress)
+	_save_index_and_metadata(index, metadata_store, compacted=compacted)
+	# Written last, so a failed save never leaves the sidecar ahead of the main index
+	if config.USE_BINARY_INDEX:
+		if compacted:
+			_write_binary_sidecar(live_embeddings)
+		else:
+			_update_binary_sidecar(embeddings, start_id=start_id, stale_ids=stale_ids)
+
+	return {"added_chunks": len(all_new_chunks), "total_chunks": metadata_store.num_live}, index, metadata_store
 
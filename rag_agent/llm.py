@@ -28,10 +28,10 @@ def generate_answer(query: str, contexts: List[dict]) -> dict:
 	"""
 	key = config.get_openai_api_key()
 	ordered = sorted(contexts, key=lambda c: c.get("score", 0.0), reverse=True)
-	context_pairs = []
-	for c in ordered:
-		label = f"{os.path.basename(c['source_path'])} (page {c['page_number']})"
-		context_pairs.append((c["text"], label))
+	# Retrieved contexts carry source_name (the file's basename) from ingestion; derive it for callers that only pass source_path
+	names = [c.get("source_name") or os.path.basename(c["source_path"]) for c in ordered]
+	context_pairs = [(c["text"], f"{name} (page {c['page_number']})") for c, name in zip(ordered, names)]
+	sources = [{"source": name, "page": c["page_number"], "score": c.get("score", 0.0)} for c, name in zip(ordered, names)]
 
 	if not key:
 		# Fallback: extractive concise answer
@@ -40,14 +40,7 @@ def generate_answer(query: str, contexts: List[dict]) -> dict:
 		return {
 			"answer": answer,
 			"used_model": "extractive-fallback",
-			"sources": [
-				{
-					"source": os.path.basename(c["source_path"]),
-					"page": c["page_number"],
-					"score": c.get("score", 0.0),
-				}
-				for c in ordered
-			],
+			"sources": sources,
 		}
 
 	# OpenAI path
@@ -69,10 +62,6 @@ def generate_answer(query: str, contexts: List[dict]) -> dict:
 			max_tokens=500,
 		)
 		text = completion.choices[0].message.content or ""
-		sources = [
-			{"source": os.path.basename(c["source_path"]), "page": c["page_number"], "score": c.get("score", 0.0)}
-			for c in ordered
-		]
 		return {"answer": text.strip(), "used_model": "gpt-4o-mini", "sources": sources}
 	except Exception as e:  # graceful fallback
 		top = ordered[0] if ordered else None
@@ -80,13 +69,6 @@ def generate_answer(query: str, contexts: List[dict]) -> dict:
 		return {
 			"answer": answer,
 			"used_model": f"fallback-due-to-error: {type(e).__name__}",
-			"sources": [
-				{
-					"source": os.path.basename(c["source_path"]),
-					"page": c["page_number"],
-					"score": c.get("score", 0.0),
-				}
-				for c in ordered
-			],
+			"sources": sources,
 		}
 
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import threading
+
+import torch
+from sentence_transformers import SentenceTransformer
+
+from . import config
+
+
+_model: SentenceTransformer | None = None
+_model_lock = threading.Lock()
+
+
+def _load_embedding_model() -> SentenceTransformer:
+	"""Load the embedding model, in half precision on GPU when one is available."""
+	if torch.cuda.is_available():
+		model = SentenceTransformer(config.EMBEDDING_MODEL_NAME, device="cuda")
+		model.half()
+		return model
+	return SentenceTransformer(config.EMBEDDING_MODEL_NAME)
+
+
+def get_embedding_model() -> SentenceTransformer:
+	"""Return the process-wide embedding model, loading it on first use."""
+	global _model
+	if _model is None:
+		with _model_lock:
+			if _model is None:
+				_model = _load_embedding_model()
+	return _model
+
+
+def warm_up_embedding_model() -> None:
+	"""Load the model and run one forward pass so the first request doesn't pay for it."""
+	model = get_embedding_model()
+	with torch.inference_mode():
+		model.encode(["warmup"], show_progress_bar=False)
@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List
+
+import pymupdf
+
+
+# Kept free of torch / sentence-transformers imports: extraction worker processes import
+# only this module.
+
+
+def read_pdf_text(pdf_path: Path) -> List[str]:
+	"""Extract text per page from a PDF file."""
+	with pymupdf.open(str(pdf_path)) as doc:
+		return [doc.load_page(i).get_text("text") for i in range(doc.page_count)]
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
-import json
+import math
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import List, Tuple
 
 import faiss
 import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 
 from . import config
+from .models import get_embedding_model
+from .ingest import migrate_legacy_store
+from .store import ChunkColumns, legacy_metadata_exists, load_columns, metadata_exists
 
 
 @dataclass
@@ -16,48 +20,138 @@ class RetrievedChunk:
 	text: str
 	score: float
 	source_path: str
+	source_name: str
 	page_number: int
 	chunk_index: int
 
 
+def _load_binary_sidecar(metadata: ChunkColumns) -> Tuple[faiss.IndexBinary | None, np.ndarray | None]:
+	"""Load the binary index and memory-map the float32 vectors, if they match the metadata."""
+	if not config.BINARY_INDEX_PATH.exists() or not config.VECTORS_PATH.exists():
+		return None, None
+	binary_index = faiss.read_index_binary(str(config.BINARY_INDEX_PATH))
+	vectors = np.memmap(config.VECTORS_PATH, dtype=np.float32, mode="r").reshape(-1, binary_index.d)
+	if binary_index.ntotal != metadata.num_live or len(vectors) != len(metadata):
+		return None, None
+	return binary_index, vectors
+
+
+def _configure_search(index: faiss.Index) -> None:
+	"""Apply query-time parameters for approximate index types."""
+	index = faiss.downcast_index(index)
+	if isinstance(index, faiss.IndexIDMap):
+		index = faiss.downcast_index(index.index)
+	if isinstance(index, faiss.IndexHNSW):
+		index.hnsw.efSearch = config.HNSW_EF_SEARCH
+	elif isinstance(index, faiss.IndexIVF):
+		index.nprobe = config.IVF_NPROBE
+
+
+@dataclass
+class _SearchState:
+	"""Everything a search reads, swapped as one unit so searches never mix old and new stores."""
+
+	index: faiss.Index
+	metadata: ChunkColumns
+	binary_index: faiss.IndexBinary | None = None
+	vectors: np.ndarray | None = None
+
+
 class Retriever:
 	"""Load FAISS index/metadata and provide vector similarity search."""
 
 	def __init__(self) -> None:
 		config.ensure_directories()
-		if not config.INDEX_PATH.exists() or not config.METADATA_PATH.exists():
+		if config.INDEX_PATH.exists() and legacy_metadata_exists():
+			self._state = self._build_state(*migrate_legacy_store())
+		elif config.INDEX_PATH.exists() and metadata_exists():
+			self._state = self._build_state(faiss.read_index(str(config.INDEX_PATH)), load_columns())
+		else:
 			raise RuntimeError("No index/metadata found. Please ingest PDFs first.")
-		self.index: faiss.Index = faiss.read_index(str(config.INDEX_PATH))
-		self.metadata: List[Dict] = []
-		with open(config.METADATA_PATH, "r", encoding="utf-8") as f:
-			for line in f:
-				self.metadata.append(json.loads(line))
-		self.model: SentenceTransformer = SentenceTransformer(config.EMBEDDING_MODEL_NAME)
-
-	def _embed_query(self, query: str) -> np.ndarray:
-		emb = self.model.encode([query], convert_to_numpy=True, normalize_embeddings=False)
-		n = np.linalg.norm(emb, axis=1, keepdims=True) + 1e-10
-		return (emb / n).astype(np.float32)
+		self.model: SentenceTransformer = get_embedding_model()
 
-	def search(self, query: str, top_k: int | None = None) -> List[RetrievedChunk]:
-		k = top_k or config.TOP_K
-		query_vec = self._embed_query(query)
-		scores, indices = self.index.search(query_vec, k)
-		scores = scores.flatten().tolist()
-		indices = indices.flatten().tolist()
+	@property
+	def index(self) -> faiss.Index:
+		return self._state.index
+
+	@property
+	def metadata(self) -> ChunkColumns:
+		return self._state.metadata
+
+	def swap_index(self, index: faiss.Index, metadata: ChunkColumns) -> None:
+		"""Adopt an index and metadata freshly updated by ingestion, without re-reading them from disk."""
+		# A single assignment: compaction renumbers chunk ids, so the index, metadata and
+		# sidecar must change together
+		self._state = self._build_state(index, metadata)
+
+	@staticmethod
+	def _build_state(index: faiss.Index, metadata: ChunkColumns) -> _SearchState:
+		_configure_search(index)
+		state = _SearchState(index=index, metadata=metadata)
+		if config.USE_BINARY_INDEX:
+			state.binary_index, state.vectors = _load_binary_sidecar(metadata)
+		return state
+
+	def embed_query(self, query: str) -> np.ndarray:
+		return self.embed_queries([query])
+
+	def embed_queries(self, queries: List[str]) -> np.ndarray:
+		"""Embed queries in a single forward pass."""
+		with torch.inference_mode():
+			emb = self.model.encode(queries, batch_size=len(queries), show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True)
+		return emb.astype(np.float32)
+
+	@staticmethod
+	def _search_binary(state: _SearchState, query_vecs: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+		"""Hamming search over sign bits, then rerank each query's candidates by exact inner product."""
+		n_candidates = max(k, config.BINARY_RERANK_CANDIDATES)
+		_, candidates = state.binary_index.search(np.packbits(query_vecs > 0, axis=1), n_candidates)
+		rows: List[Tuple[np.ndarray, np.ndarray]] = []
+		for query_vec, cand in zip(query_vecs, candidates):
+			cand = cand[cand >= 0]
+			scores = state.vectors[cand] @ query_vec
+			order = np.argsort(-scores)[:k]
+			rows.append((scores[order], cand[order]))
+		return rows
+
+	@staticmethod
+	def _to_chunks(m: ChunkColumns, scores: np.ndarray, indices: np.ndarray) -> List[RetrievedChunk]:
 		results: List[RetrievedChunk] = []
-		for score, idx in zip(scores, indices):
-			if idx < 0 or idx >= len(self.metadata):
+		for score, idx in zip(scores.tolist(), indices.tolist()):
+			if idx < 0 or idx >= len(m) or m.deleted[idx]:
 				continue
-			m = self.metadata[idx]
 			results.append(
 				RetrievedChunk(
-					text=m["text"],
+					text=m.text(idx),
 					score=float(score),
-					source_path=m["source_path"],
-					page_number=int(m["page_number"]),
-					chunk_index=int(m["chunk_index"]),
+					source_path=m.source_path(idx),
+					source_name=m.source_name(idx),
+					page_number=int(m.page_numbers[idx]),
+					chunk_index=int(m.chunk_indices[idx]),
 				)
 			)
 		return results
 
+	def search(self, query: str, top_k: int | None = None) -> List[RetrievedChunk]:
+		return self.search_vector(self.embed_query(query), top_k)
+
+	def search_vector(self, query_vec: np.ndarray, top_k: int | None = None) -> List[RetrievedChunk]:
+		"""Search with an already embedded (1, dim) query vector."""
+		return self.search_vectors(query_vec, top_k)[0]
+
+	def search_batch(self, queries: List[str], top_k: int | None = None) -> List[List[RetrievedChunk]]:
+		"""Search several queries with one encode call and one index search."""
+		return self.search_vectors(self.embed_queries(queries), top_k)
+
+	def search_vectors(self, query_vecs: np.ndarray, top_k: int | None = None) -> List[List[RetrievedChunk]]:
+		"""Search with already embedded (n, dim) query vectors."""
+		k = top_k or config.TOP_K
+		state = self._state
+		if state.binary_index is not None:
+			rows = self._search_binary(state, query_vecs, k)
+		else:
+			# Indexes that can't remove vectors (HNSW) still return deleted chunks; fetch extra to make up for them
+			n_fetch = math.ceil(k * state.index.ntotal / max(state.metadata.num_live, 1))
+			scores, indices = state.index.search(query_vecs, max(k, min(n_fetch, state.index.ntotal)))
+			rows = list(zip(scores, indices))
+		return [self._to_chunks(state.metadata, row_scores, row_indices)[:k] for row_scores, row_indices in rows]
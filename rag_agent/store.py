@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import dataclasses
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from . import config
+
+
+@dataclass
+class ChunkColumns:
+	"""Chunk metadata stored column-wise; row i describes FAISS id i.
+
+	Texts live in one UTF-8 blob (memory-mapped from disk) addressed by offsets, and
+	source paths are dictionary-encoded, so loading is O(1) in corpus text size and a
+	lookup only decodes the rows it touches.
+	"""
+
+	text_blob: np.ndarray  # uint8
+	text_offsets: np.ndarray  # int64, len(self) + 1
+	source_table: List[str]
+	source_ids: np.ndarray  # int32
+	page_numbers: np.ndarray  # int32
+	chunk_indices: np.ndarray  # int32
+	deleted: np.ndarray  # bool, rows of removed chunks kept as tombstones until compaction
+	source_names: List[str] = field(init=False)  # basenames of source_table, for display
+	num_live: int = field(init=False)  # rows not deleted
+
+	def __post_init__(self) -> None:
+		self.source_names = [os.path.basename(path) for path in self.source_table]
+		self.num_live = len(self.deleted) - int(np.count_nonzero(self.deleted))
+
+	@classmethod
+	def empty(cls) -> ChunkColumns:
+		return cls(
+			text_blob=np.empty(0, dtype=np.uint8),
+			text_offsets=np.zeros(1, dtype=np.int64),
+			source_table=[],
+			source_ids=np.empty(0, dtype=np.int32),
+			page_numbers=np.empty(0, dtype=np.int32),
+			chunk_indices=np.empty(0, dtype=np.int32),
+			deleted=np.empty(0, dtype=bool),
+		)
+
+	def __len__(self) -> int:
+		return len(self.source_ids)
+
+	def text(self, i: int) -> str:
+		return self.text_blob[self.text_offsets[i]:self.text_offsets[i + 1]].tobytes().decode("utf-8")
+
+	def source_path(self, i: int) -> str:
+		return self.source_table[self.source_ids[i]]
+
+	def source_name(self, i: int) -> str:
+		return self.source_names[self.source_ids[i]]
+
+
+def metadata_exists() -> bool:
+	return config.METADATA_PATH.exists() and config.TEXTS_PATH.exists()
+
+
+def legacy_metadata_exists() -> bool:
+	"""Whether the data dir holds a store from older versions (metadata.jsonl) not yet migrated."""
+	return config.LEGACY_METADATA_PATH.exists() and not metadata_exists()
+
+
+def read_legacy_metadata() -> List[Dict[str, Any]]:
+	"""Read the records of metadata.jsonl; record i describes FAISS id i."""
+	with open(config.LEGACY_METADATA_PATH, "r", encoding="utf-8") as f:
+		return [json.loads(line) for line in f]
+
+
+def _map_texts(path: Path | None = None) -> np.ndarray:
+	path = path or config.TEXTS_PATH
+	if path.exists() and path.stat().st_size:
+		return np.memmap(path, dtype=np.uint8, mode="r")
+	return np.empty(0, dtype=np.uint8)  # an empty file can't be mapped
+
+
+def load_columns() -> ChunkColumns:
+	"""Load the columnar store, memory-mapping the text blob."""
+	with np.load(config.METADATA_PATH) as data:
+		return ChunkColumns(
+			text_blob=_map_texts(),
+			text_offsets=data["text_offsets"],
+			source_table=data["source_table"].tolist(),
+			source_ids=data["source_ids"],
+			page_numbers=data["page_numbers"],
+			chunk_indices=data["chunk_indices"],
+			# Stores written before deletion tracking have no tombstone column
+			deleted=data["deleted"] if "deleted" in data.files else np.zeros(len(data["source_ids"]), dtype=bool),
+		)
+
+
+def append_chunks(
+	columns: ChunkColumns,
+	texts: List[str],
+	source_paths: List[str],
+	page_numbers: List[int],
+	chunk_indices: List[int],
+) -> ChunkColumns:
+	"""Append chunk texts to texts.bin and return the columns extended with the new rows."""
+	encoded = [t.encode("utf-8") for t in texts]
+	end = int(columns.text_offsets[-1])
+	new_offsets = end + np.cumsum([len(b) for b in encoded], dtype=np.int64)
+	with open(config.TEXTS_PATH, "ab") as f:
+		f.truncate(end)  # drop bytes past the last recorded offset, e.g. from an interrupted ingestion
+		f.write(b"".join(encoded))
+
+	source_table = list(columns.source_table)
+	source_lookup: Dict[str, int] = {path: i for i, path in enumerate(source_table)}
+	for path in source_paths:
+		if path not in source_lookup:
+			source_lookup[path] = len(source_table)
+			source_table.append(path)
+
+	return ChunkColumns(
+		text_blob=_map_texts(),
+		text_offsets=np.concatenate([columns.text_offsets, new_offsets]),
+		source_table=source_table,
+		source_ids=np.concatenate([columns.source_ids, np.array([source_lookup[p] for p in source_paths], dtype=np.int32)]),
+		page_numbers=np.concatenate([columns.page_numbers, np.array(page_numbers, dtype=np.int32)]),
+		chunk_indices=np.concatenate([columns.chunk_indices, np.array(chunk_indices, dtype=np.int32)]),
+		deleted=np.concatenate([columns.deleted, np.zeros(len(texts), dtype=bool)]),
+	)
+
+
+def mark_deleted(columns: ChunkColumns, ids: np.ndarray) -> ChunkColumns:
+	"""Return the columns with the given rows flagged as deleted; the rows stay, so ids keep matching."""
+	deleted = columns.deleted.copy()
+	deleted[ids] = True
+	return dataclasses.replace(columns, deleted=deleted)
+
+
+def compact_columns(columns: ChunkColumns, texts_path: Path) -> ChunkColumns:
+	"""Drop deleted rows, renumbering the remaining rows 0..n-1, and write their texts to texts_path.
+
+	texts.bin is left untouched: the caller moves texts_path onto it (os.replace, so readers
+	still mapping the old file keep a valid mapping) once the matching columns are saved.
+	"""
+	keep = ~columns.deleted
+	lengths = np.diff(columns.text_offsets)
+	columns.text_blob[np.repeat(keep, lengths)].tofile(texts_path)
+
+	used_sources, source_ids = np.unique(columns.source_ids[keep], return_inverse=True)
+	return ChunkColumns(
+		text_blob=_map_texts(texts_path),
+		text_offsets=np.concatenate([[0], np.cumsum(lengths[keep])]).astype(np.int64),
+		source_table=[columns.source_table[i] for i in used_sources],
+		source_ids=source_ids.astype(np.int32),
+		page_numbers=columns.page_numbers[keep],
+		chunk_indices=columns.chunk_indices[keep],
+		deleted=np.zeros(int(np.count_nonzero(keep)), dtype=bool),
+	)
+
+
+def save_columns(columns: ChunkColumns, path: Path | None = None) -> None:
+	"""Write every column except the text blob (already on disk) to metadata.npz, or to path."""
+	np.savez_compressed(
+		path or config.METADATA_PATH,
+		text_offsets=columns.text_offsets,
+		source_table=np.array(columns.source_table, dtype=str),
+		source_ids=columns.source_ids,
+		page_numbers=columns.page_numbers,
+		chunk_indices=columns.chunk_indices,
+		deleted=columns.deleted,
+	)